@@ -1,2 +1,3 @@
+from .budget import BudgetController
 from .base import BaseAgent
 from .judge import JudgeAgent
@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import httpx
 
@@ -11,11 +12,14 @@ from pydantic_ai import (
     ModelSettings,
     Tool,
     BinaryImage,
+    NativeOutput,
 )
 from pydantic_ai.builtin_tools import AbstractBuiltinTool
+from pydantic_ai.usage import RunUsage
 from typing import Optional, List, Union
 
-from src.utils import setup_logger
+from src.agents.budget import BudgetController
+from src.utils import ClientRegistry, setup_logger
 
 
 class BaseAgent(ABC):
@@ -26,6 +30,8 @@ class BaseAgent(ABC):
     - prepare_images(images): prepares images for the agent by converting them to appropriate format
     - prepare_documents(document_urls): prepares document urls for the agent
     - invoke(query, images=None, document_urls=None): The main logic for running the agent with specified query and images
+    - estimate_input_tokens(message_content, budget): estimates the input tokens of a request before it is sent
+    - resolve_model(provider, model_name): returns the model to run, backed by the registry's shared client if one is injected
 
     @abstractmethods:
     - execute(state):
@@ -51,13 +57,21 @@ class BaseAgent(ABC):
         builtin_tools: Optional[List[AbstractBuiltinTool]] = [],
         output_type: Union[type, BaseModel] = str,
         model_settings: Optional[dict] = {},
+        budget: Optional[BudgetController] = None,
+        registry: Optional[ClientRegistry] = None,
     ):
         self.logger = setup_logger(f"[{self.__class__.__name__}]")
+        self.model_name = model_name
         self.model_str = f"{provider}:{model_name}"
+        self.budget = budget
+        self.registry = registry
+        self.static_prompt = f"{system_prompt or ''}{instructions or ''}"
+        # empty prompts are left out, pydantic-ai would otherwise send an empty
+        # system instruction, which e.g. gemini rejects alongside cached content
         self.agent = Agent(
-            self.model_str,
-            system_prompt=system_prompt,
-            instructions=instructions,
+            self.resolve_model(provider, model_name),
+            system_prompt=system_prompt or (),
+            instructions=instructions or None,
             tools=tools,
             builtin_tools=builtin_tools,
             output_type=output_type,
@@ -67,6 +81,11 @@ class BaseAgent(ABC):
     def __repr__(self):
         return f"<{self.__class__.__name__}, model={self.model_str}>"
 
+    def resolve_model(self, provider: str, model_name: str):
+        if self.registry is None:
+            return f"{provider}:{model_name}"
+        return self.registry.get_model(provider, model_name)
+
     def format_chat_history(self, chat_history: str) -> str:
         return f"Chat History:\n{chat_history}\n\n"
 
@@ -92,6 +111,16 @@ class BaseAgent(ABC):
         except Exception:
             return False
 
+    def _is_timeout(self, e: BaseException) -> bool:
+        """helper method to check if an error, or any error it was raised from, is a transport timeout"""
+        while e is not None:
+            if isinstance(
+                e, (httpx.TimeoutException, asyncio.TimeoutError, TimeoutError)
+            ):
+                return True
+            e = e.__cause__ or e.__context__
+        return False
+
     def prepare_images(self, images: List[str]):
         """
         prepares images for the agent by converting them to appropriate format
@@ -168,6 +197,23 @@ class BaseAgent(ABC):
     def prepare_documents(self, document_urls: List[str]):
         return [DocumentUrl(url=url) for url in document_urls]
 
+    def estimate_input_tokens(
+        self,
+        message_content: List,
+        budget: Optional[BudgetController] = None,
+    ) -> int:
+        """
+        estimates the input tokens of a request, including the static system prompt
+        and instructions. non-text parts (images, documents) are not counted
+        """
+        budget = budget or self.budget
+        if budget is None:
+            return 0
+        text = self.static_prompt + "".join(
+            part for part in message_content if isinstance(part, str)
+        )
+        return budget.estimate_tokens(text)
+
     async def invoke(
         self,
         query: str = "",
@@ -176,6 +222,9 @@ class BaseAgent(ABC):
         images: Optional[List[str]] = None,
         document_urls: Optional[List[str]] = None,
         is_image_output: bool = False,
+        model_config: Optional[dict] = None,
+        output_type: Optional[Union[type, NativeOutput]] = None,
+        budget: Optional[BudgetController] = None,
     ) -> Union[str, BaseModel, BinaryImage]:
         """
         runs the agent with specified query and images
@@ -186,6 +235,9 @@ class BaseAgent(ABC):
             chat_history (Optional[str]): Previous chat history to provide context
             images (Optional[List[str]]): A list of image URLs or local file paths
             document_urls (Optional[List[str]]): A list of document URLs to provide context
+            model_config (Optional[dict]): A formatted model config from AgentConfig to run this call with instead of the agent's default model
+            output_type (Optional[type]): An output type to use for this call instead of the agent's default
+            budget (Optional[BudgetController]): The budget to charge this call to instead of the agent's default
         """
         message_content = []
         if query:
@@ -204,8 +256,32 @@ class BaseAgent(ABC):
             prepped_docs = self.prepare_documents(document_urls)
             message_content.extend(prepped_docs)
 
+        model_name = self.model_name
+        run_kwargs = {}
+        if model_config:
+            model_name = model_config["model_name"]
+            run_kwargs["model"] = self.resolve_model(
+                model_config["provider"], model_name
+            )
+            run_kwargs["model_settings"] = ModelSettings(
+                **model_config["model_settings"]
+            )
+
+        if output_type is not None:
+            run_kwargs["output_type"] = output_type
+
+        budget = budget or self.budget
+        estimated_tokens = self.estimate_input_tokens(message_content, budget)
+        if budget and not budget.reserve(model_name, estimated_tokens):
+            return ""
+
+        # updated by pydantic-ai as the run goes, so failed runs (e.g. output
+        # validation retries running out) still report the requests they made
+        usage = RunUsage()
         try:
-            response = await self.agent.run(user_prompt=message_content)
+            response = await self.agent.run(
+                user_prompt=message_content, usage=usage, **run_kwargs
+            )
             if hasattr(response, "output") and response.output:
                 if is_image_output and hasattr(response.output, "data_uri"):
                     return response.output.data_uri
@@ -214,4 +290,19 @@ class BaseAgent(ABC):
 
         except Exception as e:
             self.logger.error(f"{e}")
+            if not usage.input_tokens and not usage.output_tokens:
+                if usage.requests or self._is_timeout(e):
+                    # the request reached the provider and may have been billed
+                    # without usage coming back, so charge the estimate to stay
+                    # under the ceilings
+                    usage = RunUsage(
+                        requests=usage.requests or 1, input_tokens=estimated_tokens
+                    )
+                else:
+                    # e.g. auth or config errors, raised before anything was sent
+                    usage = None
             return ""
+
+        finally:
+            if budget:
+                budget.settle(model_name, estimated_tokens, usage=usage)
@@ -0,0 +1,239 @@
+from typing import Optional, Dict, List, Callable, TypeVar
+
+from src.configs import AgentConfig, agent_config as default_agent_config
+from src.utils import setup_logger
+
+T = TypeVar("T")
+
+
+class BudgetController:
+    """
+    tracks token usage and cost for a single run and enforces per-run ceilings
+
+    before a request is sent, the caller reserves its estimated input tokens plus
+    the expected output tokens. once the response comes back the reservation is
+    settled against the actual usage reported by pydantic-ai.
+
+    @methods:
+    - estimate_tokens(text): rough token estimate for a piece of text
+    - estimate_cost(model_name, input_tokens, output_tokens, cached_tokens): usd cost for a call
+    - can_afford(model_name, input_tokens, output_tokens): checks the ceilings without reserving
+    - reserve(model_name, input_tokens, output_tokens): reserves budget for a call
+    - settle(model_name, input_tokens, output_tokens, usage): releases a reservation and records actual usage
+    - prioritize(items, estimate): orders items cheapest first once the budget is nearly exhausted
+    """
+
+    def __init__(
+        self,
+        pricing: Optional[Dict[str, Dict[str, float]]] = None,
+        max_tokens_per_run: Optional[int] = None,
+        max_cost_per_run: Optional[float] = None,
+        low_budget_ratio: float = 0.1,
+        chars_per_token: int = 4,
+        expected_output_tokens: int = 2048,
+    ):
+        self.logger = setup_logger(f"[{self.__class__.__name__}]")
+        self.pricing = pricing or {}
+        self.max_tokens_per_run = max_tokens_per_run
+        self.max_cost_per_run = max_cost_per_run
+        self.low_budget_ratio = low_budget_ratio
+        self.chars_per_token = chars_per_token
+        self.expected_output_tokens = expected_output_tokens
+
+        self.used_tokens = 0
+        self.used_cached_tokens = 0
+        self.used_cost = 0.0
+        self.reserved_tokens = 0
+        self.reserved_cost = 0.0
+        self.usage_by_model: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_config(cls, config: Optional[AgentConfig] = None) -> "BudgetController":
+        config = config or default_agent_config
+        return cls(pricing=config.pricing, **config.budget_config)
+
+    def __repr__(self):
+        return (
+            f"<{self.__class__.__name__}, tokens={self.used_tokens}/{self.max_tokens_per_run}, "
+            f"cost={self.used_cost:.4f}/{self.max_cost_per_run}>"
+        )
+
+    def estimate_tokens(self, text: str) -> int:
+        """rough token estimate based on character count"""
+        if not text:
+            return 0
+        return len(text) // self.chars_per_token + 1
+
+    def estimate_cost(
+        self,
+        model_name: str,
+        input_tokens: int,
+        output_tokens: int,
+        cached_tokens: int = 0,
+    ) -> float:
+        """usd cost of a call, pricing is per million tokens"""
+        pricing = self.pricing.get(model_name)
+        if pricing is None:
+            self.logger.warning(f"no pricing configured for {model_name}, assuming 0")
+            pricing = {}
+        uncached_tokens = max(input_tokens - cached_tokens, 0)
+        cost = (
+            uncached_tokens * pricing.get("input", 0.0)
+            + cached_tokens * pricing.get("cached_input", pricing.get("input", 0.0))
+            + output_tokens * pricing.get("output", 0.0)
+        )
+        return cost / 1_000_000
+
+    @property
+    def remaining_tokens(self) -> Optional[int]:
+        if self.max_tokens_per_run is None:
+            return None
+        return self.max_tokens_per_run - self.used_tokens - self.reserved_tokens
+
+    @property
+    def remaining_cost(self) -> Optional[float]:
+        if self.max_cost_per_run is None:
+            return None
+        return self.max_cost_per_run - self.used_cost - self.reserved_cost
+
+    @property
+    def is_exhausted(self) -> bool:
+        remaining_tokens = self.remaining_tokens
+        remaining_cost = self.remaining_cost
+        return (remaining_tokens is not None and remaining_tokens <= 0) or (
+            remaining_cost is not None and remaining_cost <= 0
+        )
+
+    @property
+    def is_nearly_exhausted(self) -> bool:
+        """true once either ceiling has less than low_budget_ratio remaining"""
+        if self.max_tokens_per_run is not None:
+            if self.remaining_tokens <= self.max_tokens_per_run * self.low_budget_ratio:
+                return True
+        if self.max_cost_per_run is not None:
+            if self.remaining_cost <= self.max_cost_per_run * self.low_budget_ratio:
+                return True
+        return False
+
+    def can_afford(
+        self,
+        model_name: str,
+        input_tokens: int,
+        output_tokens: Optional[int] = None,
+    ) -> bool:
+        output_tokens = (
+            self.expected_output_tokens if output_tokens is None else output_tokens
+        )
+        remaining_tokens = self.remaining_tokens
+        if (
+            remaining_tokens is not None
+            and input_tokens + output_tokens > remaining_tokens
+        ):
+            return False
+        remaining_cost = self.remaining_cost
+        cost = self.estimate_cost(model_name, input_tokens, output_tokens)
+        if remaining_cost is not None and cost > remaining_cost:
+            return False
+        return True
+
+    def reserve(
+        self,
+        model_name: str,
+        input_tokens: int,
+        output_tokens: Optional[int] = None,
+    ) -> bool:
+        """
+        reserves budget for a call, returns False if the call would exceed a ceiling
+        """
+        output_tokens = (
+            self.expected_output_tokens if output_tokens is None else output_tokens
+        )
+        if not self.can_afford(model_name, input_tokens, output_tokens):
+            self.logger.warning(
+                f"budget exhausted, refusing call to {model_name} "
+                f"(~{input_tokens + output_tokens} tokens), {self}"
+            )
+            return False
+        self.reserved_tokens += input_tokens + output_tokens
+        self.reserved_cost += self.estimate_cost(
+            model_name, input_tokens, output_tokens
+        )
+        return True
+
+    def settle(
+        self,
+        model_name: str,
+        input_tokens: int,
+        output_tokens: Optional[int] = None,
+        usage=None,
+    ):
+        """
+        releases a reservation and records the actual usage of the call
+
+        Args:
+            model_name (str): The model the reservation was made for
+            input_tokens (int): The reserved input tokens
+            output_tokens (Optional[int]): The reserved output tokens
+            usage (Optional[RunUsage]): The usage reported by pydantic-ai, None if the call failed
+        """
+        output_tokens = (
+            self.expected_output_tokens if output_tokens is None else output_tokens
+        )
+        self.reserved_tokens = max(
+            self.reserved_tokens - input_tokens - output_tokens, 0
+        )
+        self.reserved_cost = max(
+            self.reserved_cost
+            - self.estimate_cost(model_name, input_tokens, output_tokens),
+            0.0,
+        )
+        if usage is not None:
+            self.record(model_name, usage)
+
+    def record(self, model_name: str, usage):
+        """records actual usage from a pydantic-ai RunUsage"""
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        cached_tokens = getattr(usage, "cache_read_tokens", 0) or 0
+        cost = self.estimate_cost(
+            model_name, input_tokens, output_tokens, cached_tokens
+        )
+
+        self.used_tokens += input_tokens + output_tokens
+        self.used_cached_tokens += cached_tokens
+        self.used_cost += cost
+
+        model_usage = self.usage_by_model.setdefault(
+            model_name,
+            {
+                "requests": 0,
+                "input_tokens": 0,
+                "cached_tokens": 0,
+                "output_tokens": 0,
+                "cost": 0.0,
+            },
+        )
+        model_usage["requests"] += getattr(usage, "requests", 1) or 1
+        model_usage["input_tokens"] += input_tokens
+        model_usage["cached_tokens"] += cached_tokens
+        model_usage["output_tokens"] += output_tokens
+        model_usage["cost"] += cost
+
+    def prioritize(self, items: List[T], estimate: Callable[[T], int]) -> List[T]:
+        """
+        orders items cheapest first when the budget is nearly exhausted so that as
+        many items as possible are covered before the ceiling is hit
+        """
+        if not self.is_nearly_exhausted:
+            return list(items)
+        return sorted(items, key=estimate)
+
+    def summary(self) -> Dict:
+        return {
+            "used_tokens": self.used_tokens,
+            "used_cached_tokens": self.used_cached_tokens,
+            "used_cost": round(self.used_cost, 6),
+            "max_tokens_per_run": self.max_tokens_per_run,
+            "max_cost_per_run": self.max_cost_per_run,
+            "by_model": self.usage_by_model,
+        }
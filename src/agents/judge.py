@@ -1,17 +1,264 @@
+from pydantic_ai import NativeOutput
+from pydantic_ai.usage import RunUsage
+from typing import Optional, Union, Dict, List
+
 from src.agents.base import BaseAgent
+from src.agents.budget import BudgetController
 from src.configs import agent_config
-from src.outputs import JudgeOutput
+from src.outputs import ContextualLinkMetrics, JudgeOutput, LinkMetrics, MetricScore
 from src.prompts import JUDGE_SYSTEM_PROMPT, JUDGE_INSTRUCTIONS
+from src.utils import ClientRegistry
 
 
 class JudgeAgent(BaseAgent):
-    def __init__(self):
-        config = agent_config.gemini_flash_lite_config
+    """
+    judges a single outbound link against the 8 link metrics
+
+    the model only generates the LinkMetrics, the JudgeOutput is assembled
+    locally with the known link url and a computed overall score
+
+    in cascade mode, links are first judged by the cheapest model in the judge
+    cascade config and only escalated to the next model when the verdict is
+    uncertain (borderline overall score, or no valid output at all)
+
+    when the domain metrics are reused from a domain profile, the model only
+    generates the remaining ContextualLinkMetrics
+
+    requests are laid out as a stable prefix (system prompt, instructions, post
+    content and its outbound links) followed by the per-link suffix, so provider
+    side prompt caching can reuse the prefix across every link of a post. with
+    explicit caching on, the prefix of a gemini post is also stored as cached
+    content and first-tier calls only send the suffix
+
+    @methods:
+    - build_prefix(post_content, outbound_links): the stable, per-post part of a request
+    - build_suffix(context, domain_context, prior_metrics): the per-link part of a request
+    - create_post_cache(prefix, n_links, budget): creates an explicit gemini cache for a post's prefix
+    - judge(link_url, query, context, domain_context, prior_metrics, cached_content, budget, tier_counts): judges a link, escalating through the cascade when needed
+    - needs_escalation(output): checks whether a verdict should be escalated
+    """
+
+    def __init__(
+        self,
+        budget: Optional[BudgetController] = None,
+        cascade: bool = False,
+        registry: Optional[ClientRegistry] = None,
+        explicit_cache: Optional[bool] = None,
+    ):
+        cascade_config = agent_config.judge_cascade_config
+        self.tiers = (
+            cascade_config["models"]
+            if cascade
+            else [agent_config.gemini_flash_lite_config]
+        )
+        self.borderline_low = cascade_config["borderline_low"]
+        self.borderline_high = cascade_config["borderline_high"]
+        # number of verdicts settled at each tier across all callers, for reporting
+        self.tier_counts = [0] * len(self.tiers)
+
+        config = self.tiers[0]
         super().__init__(
             provider=config["provider"],
             model_name=config["model_name"],
             system_prompt=JUDGE_SYSTEM_PROMPT,
             instructions=JUDGE_INSTRUCTIONS,
-            output_type=JudgeOutput,
+            output_type=LinkMetrics,
             model_settings=config["model_settings"],
+            budget=budget,
+            registry=registry,
+        )
+
+        cache_config = agent_config.judge_prompt_cache_config
+        self.cache_ttl_seconds = cache_config["ttl_seconds"]
+        self.cache_min_prefix_tokens = cache_config["min_prefix_tokens"]
+        self.cache_min_links = cache_config["min_links"]
+        explicit_cache = (
+            cache_config["explicit"] if explicit_cache is None else explicit_cache
         )
+        # gemini rejects cached content alongside a system instruction or tools, so
+        # cached calls go through a prompt-less agent using native structured output
+        self.cached_judge = None
+        if explicit_cache and config["provider"] == "google-gla":
+            self.cached_judge = BaseAgent(
+                provider=config["provider"],
+                model_name=config["model_name"],
+                output_type=NativeOutput(LinkMetrics),
+                model_settings=config["model_settings"],
+                budget=budget,
+                registry=registry,
+            )
+            cached_agent = self.cached_judge.agent
+            if (
+                cached_agent._system_prompts
+                or cached_agent._instructions
+                or cached_agent._system_prompt_functions
+            ):
+                # any system instruction would get every cached call rejected and
+                # then paid for again in full, so don't cache at all
+                self.logger.warning(
+                    "cached judge carries a system prompt, disabling explicit caching"
+                )
+                self.cached_judge = None
+
+    def needs_escalation(self, output: Union[JudgeOutput, str]) -> bool:
+        if not isinstance(output, JudgeOutput):
+            return True
+
+        return self.borderline_low <= output.overall_score <= self.borderline_high
+
+    def build_prefix(self, post_content: str, outbound_links: List[str]) -> str:
+        """
+        the part of a request shared by every link of a post. links are sorted so
+        the prefix is byte-identical across links, tiers and runs
+        """
+        return f"This is the content of the main blog post: {post_content}\n\n And these are all the outbound links in the article: {sorted(outbound_links)}"
+
+    def build_suffix(
+        self,
+        context: Optional[str] = None,
+        domain_context: Optional[str] = None,
+        prior_metrics: Optional[Dict[str, MetricScore]] = None,
+    ) -> str:
+        """
+        the per-link part of a request, always sent after the prefix
+        """
+        parts = [context] if context else []
+        if domain_context:
+            parts.append(domain_context)
+        if prior_metrics:
+            parts.append(
+                f"The {', '.join(prior_metrics)} scores are already known for this "
+                "domain, score only the remaining metrics."
+            )
+        return "\n\n".join(parts)
+
+    async def create_post_cache(
+        self,
+        prefix: str,
+        n_links: int,
+        budget: Optional[BudgetController] = None,
+    ) -> Optional[str]:
+        """
+        stores the system prompt, instructions and post prefix as gemini cached
+        content, returning its name. returns None when explicit caching is off or
+        the post is too small or has too few links for the cache to pay off, or
+        the budget can't cover writing it. the cache expires on its own after the
+        configured ttl
+        """
+        if self.cached_judge is None or n_links < self.cache_min_links:
+            return None
+        budget = budget or self.budget
+        if budget:
+            # estimated the same way as the requests that will read the cache
+            prefix_tokens = self.estimate_input_tokens([prefix], budget)
+        else:
+            chars_per_token = agent_config.budget_config["chars_per_token"]
+            prefix_tokens = (len(self.static_prompt) + len(prefix)) // chars_per_token
+        if prefix_tokens < self.cache_min_prefix_tokens:
+            return None
+        # writing the cache has no output, only the prefix is billed
+        if budget and not budget.can_afford(self.model_name, prefix_tokens, 0):
+            self.logger.warning("skipping prompt cache, run budget exhausted")
+            return None
+
+        try:
+            model = self.resolve_model(self.tiers[0]["provider"], self.model_name)
+            if isinstance(model, str):
+                from pydantic_ai.models.google import GoogleModel
+
+                model = GoogleModel(self.model_name)
+            cache = await model.client.aio.caches.create(
+                model=self.model_name,
+                config={
+                    "system_instruction": f"{JUDGE_SYSTEM_PROMPT}\n\n{JUDGE_INSTRUCTIONS}",
+                    "contents": [prefix],
+                    "ttl": f"{self.cache_ttl_seconds}s",
+                },
+            )
+        except Exception as e:
+            self.logger.error(f"failed to create prompt cache: {e}")
+            return None
+
+        if budget and cache.usage_metadata:
+            # writing the cache is billed like a regular prompt
+            budget.record(
+                self.model_name,
+                RunUsage(
+                    requests=1, input_tokens=cache.usage_metadata.total_token_count
+                ),
+            )
+        return cache.name
+
+    async def judge(
+        self,
+        link_url: str,
+        query: str,
+        context: Optional[str] = None,
+        domain_context: Optional[str] = None,
+        prior_metrics: Optional[Dict[str, MetricScore]] = None,
+        cached_content: Optional[str] = None,
+        budget: Optional[BudgetController] = None,
+        tier_counts: Optional[List[int]] = None,
+    ) -> Union[JudgeOutput, str]:
+        """
+        judges a link, starting from the cheapest model and escalating only when
+        the verdict is uncertain. returns the last valid verdict if a stronger
+        model fails or the budget can't cover the escalation
+
+        Args:
+            link_url (str): The outbound link being judged
+            query (str): The blog post and its outbound links
+            context (Optional[str]): The scraped content of the outbound link
+            domain_context (Optional[str]): A summary of prior verdicts for the link's domain
+            prior_metrics (Optional[Dict[str, MetricScore]]): Domain metric scores to reuse instead of generating them
+            cached_content (Optional[str]): Name of the post's explicit cache from create_post_cache, used by the first tier
+            budget (Optional[BudgetController]): The budget to charge the calls to instead of the judge's default
+            tier_counts (Optional[List[int]]): The caller's per-tier verdict counts, updated along with the judge's own
+        """
+        output_type = ContextualLinkMetrics if prior_metrics else None
+        suffix = self.build_suffix(context, domain_context, prior_metrics)
+
+        best = ""
+        for tier, config in enumerate(self.tiers):
+            res = ""
+            if tier == 0 and cached_content and self.cached_judge is not None:
+                # the prefix lives in the cache, only the per-link suffix is sent
+                res = await self.cached_judge.invoke(
+                    query=suffix,
+                    model_config={
+                        **config,
+                        "model_settings": {
+                            **config["model_settings"],
+                            "google_cached_content": cached_content,
+                        },
+                    },
+                    output_type=NativeOutput(output_type) if output_type else None,
+                    budget=budget,
+                )
+            # no cache, or the cache expired or failed, so send the full request
+            if not isinstance(res, (LinkMetrics, ContextualLinkMetrics)):
+                res = await self.invoke(
+                    query=query,
+                    context=suffix,
+                    model_config=config,
+                    output_type=output_type,
+                    budget=budget,
+                )
+            if prior_metrics and isinstance(res, ContextualLinkMetrics):
+                res = LinkMetrics(**dict(res), **prior_metrics)
+            if isinstance(res, LinkMetrics):
+                res = JudgeOutput(link_url=link_url, metrics=res)
+                best = res
+
+            if not self.needs_escalation(res):
+                break
+
+            if tier + 1 < len(self.tiers):
+                self.logger.info(
+                    f"escalating from {config['model_name']} to {self.tiers[tier + 1]['model_name']}"
+                )
+
+        self.tier_counts[tier] += 1
+        if tier_counts is not None:
+            tier_counts[tier] += 1
+        return best
@@ -5,6 +5,10 @@ class AgentConfig:
     def __init__(self, model_config_path: str = "src/configs/model_config.yaml"):
         self.model_config_path = model_config_path
         self.models = self.load_model_configs()
+        self.budget = self.load_budget_config()
+        self.cascades = self.load_cascade_configs()
+        self.globals = self.load_global_config()
+        self.prompt_caches = self.load_prompt_cache_configs()
 
     def load_model_configs(self):
         with open(self.model_config_path, "r") as f:
@@ -21,10 +25,58 @@ class AgentConfig:
             },
         }
 
+    def load_budget_config(self):
+        with open(self.model_config_path, "r") as f:
+            budget = yaml.safe_load(f).get("budget", {})
+        return budget
+
+    def load_global_config(self):
+        with open(self.model_config_path, "r") as f:
+            global_config = yaml.safe_load(f).get("global", {})
+        return global_config
+
+    def load_cascade_configs(self):
+        with open(self.model_config_path, "r") as f:
+            cascades = yaml.safe_load(f).get("cascade", {})
+        return cascades
+
+    def load_prompt_cache_configs(self):
+        with open(self.model_config_path, "r") as f:
+            prompt_caches = yaml.safe_load(f).get("prompt_cache", {})
+        return prompt_caches
+
+    def get_model_config(self, model_name: str):
+        config = self.models.get(model_name, {})
+        return self.format_model_config(config)
+
+    def get_pricing(self, model_name: str):
+        config = self.models.get(model_name, {})
+        pricing = config.get("pricing", {})
+        return {
+            "input": pricing.get("input", 0.0),
+            "cached_input": pricing.get("cached_input", pricing.get("input", 0.0)),
+            "output": pricing.get("output", 0.0),
+        }
+
     @property
     def available_models(self):
         return list(self.models.keys())
 
+    @property
+    def pricing(self):
+        return {name: self.get_pricing(name) for name in self.available_models}
+
+    @property
+    def budget_config(self):
+        config = self.budget
+        return {
+            "max_tokens_per_run": config.get("max_tokens_per_run"),
+            "max_cost_per_run": config.get("max_cost_per_run"),
+            "low_budget_ratio": config.get("low_budget_ratio", 0.1),
+            "chars_per_token": config.get("chars_per_token", 4),
+            "expected_output_tokens": config.get("expected_output_tokens", 2048),
+        }
+
     @property
     def gpt_mini_config(self):
         config = self.models.get("gpt-5o-mini", {})
@@ -49,3 +101,47 @@ class AgentConfig:
     def gemini_flash_image_config(self):
         config = self.models.get("gemini-2.5-flash-image-preview", {})
         return self.format_model_config(config)
+
+    @property
+    def judge_cascade_config(self):
+        config = self.cascades.get("judge", {})
+        return {
+            "models": [
+                self.get_model_config(name)
+                for name in config.get("models", ["gemini-2.5-flash-lite"])
+            ],
+            "borderline_low": config.get("borderline_low", 4.0),
+            "borderline_high": config.get("borderline_high", 6.0),
+        }
+
+    @property
+    def http_pool_config(self):
+        config = self.globals.get("http_pool", {})
+        return {
+            "http2": config.get("http2", True),
+            "max_connections": config.get("max_connections", 100),
+            "max_keepalive_connections": config.get("max_keepalive_connections", 20),
+            "keepalive_expiry": config.get("keepalive_expiry", 30),
+            "connect_timeout": config.get("connect_timeout", 5),
+            "read_timeout": config.get("read_timeout", 600),
+        }
+
+    @property
+    def scraping_config(self):
+        config = self.globals.get("scraping", {})
+        return {
+            "max_body_bytes": config.get("max_body_bytes", 5 * 1024 * 1024),
+            "chunk_size": config.get("chunk_size", 64 * 1024),
+            "max_pdf_pages": config.get("max_pdf_pages", 30),
+            "max_fetch_seconds": config.get("max_fetch_seconds", 30),
+        }
+
+    @property
+    def judge_prompt_cache_config(self):
+        config = self.prompt_caches.get("judge", {})
+        return {
+            "explicit": config.get("explicit", False),
+            "ttl_seconds": config.get("ttl_seconds", 300),
+            "min_prefix_tokens": config.get("min_prefix_tokens", 1024),
+            "min_links": config.get("min_links", 3),
+        }
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field, create_model
 
 
 class MetricScore(BaseModel):
@@ -37,15 +37,46 @@ class LinkMetrics(BaseModel):
     )
 
 
+# metrics that are mostly properties of the linked domain rather than the link
+DOMAIN_METRICS = ["source_credibility", "user_trust_eeat_alignment"]
+
+# LinkMetrics without the domain metrics, used when those are reused from a
+# domain profile. built from LinkMetrics so field order and descriptions match
+ContextualLinkMetrics = create_model(
+    "ContextualLinkMetrics",
+    **{
+        name: (field.annotation, field)
+        for name, field in LinkMetrics.model_fields.items()
+        if name not in DOMAIN_METRICS
+    },
+)
+
+
 class JudgeOutput(BaseModel):
+    """
+    verdict for a single link. the llm only generates the metrics, the link url
+    is filled in from the known link and the overall score is computed locally
+    """
+
     link_url: str = Field(..., description="The URL of the evaluated hyperlink")
     metrics: LinkMetrics = Field(
         ...,
         description="Individual metric scores for this link based on URL and content",
     )
-    overall_score: float = Field(
-        ...,
-        ge=0,
-        le=10,
-        description="Average score across all metrics for this link",
+
+    @computed_field(description="Average score across all metrics for this link")
+    @property
+    def overall_score(self) -> float:
+        scores = [metric.score for _, metric in self.metrics]
+        return round(sum(scores) / len(scores), 2)
+
+
+class TaggedJudgeOutput(BaseModel):
+    """a judge verdict tagged with where the link came from, for streaming runs"""
+
+    person: str = Field(..., description="The person whose blog the link came from")
+    blog_title: str = Field(..., description="The title of the blog post")
+    link_index: int = Field(
+        ..., description="Position of the link in the post's outbound links"
     )
+    output: JudgeOutput = Field(..., description="The verdict for the link")
@@ -1,17 +1,67 @@
+import asyncio
 import pandas as pd
-from typing import List, Tuple
 
-from src.agents import JudgeAgent
-from src.tools import ArticleCrawler, BloggerCrawler
-from src.utils import setup_logger
+from contextlib import suppress
+from typing import Any, AsyncIterator, Dict, List, Tuple, Optional
+
+from src.agents import BudgetController, JudgeAgent
+from src.configs import agent_config
+from src.outputs import JudgeOutput, TaggedJudgeOutput
+from src.parser.results import results_frame_from_dict
+from src.tools import (
+    ArticleCrawler,
+    BloggerCrawler,
+    ContentFingerprintIndex,
+    DomainProfileStore,
+)
+from src.utils import ClientRegistry, get_client_registry, setup_logger
 
 
 class BloggerParser:
-    def __init__(self):
+    def __init__(
+        self,
+        budget: Optional[BudgetController] = None,
+        cascade: bool = False,
+        registry: Optional[ClientRegistry] = None,
+        domain_store: Optional[DomainProfileStore] = None,
+        reuse_domain_metrics: bool = False,
+        fingerprint_max_distance: int = 3,
+        scraping_config: Optional[dict] = None,
+    ):
         self.logger = setup_logger(f"[{self.__class__.__name__}]")
-        self.blogger = BloggerCrawler()
-        self.article = ArticleCrawler()
-        self.judge = JudgeAgent()
+        # crawlers, agents and http clients are shared through the registry, so
+        # parsers reuse the same judge and connections. the judge is shared across
+        # budgets, each parser charges its calls to its own budget
+        self.registry = registry or get_client_registry()
+        self.blogger = self.registry.get_instance(BloggerCrawler)
+        # download limits (body size, time, pdf pages), from model_config.yaml by default
+        self.article = self.registry.get_instance(
+            ArticleCrawler,
+            session=self.registry.get_session(),
+            **(scraping_config or agent_config.scraping_config),
+        )
+        self.budget = budget or BudgetController.from_config()
+        self.judge = self.registry.get_instance(
+            JudgeAgent, cascade=cascade, registry=self.registry
+        )
+        # verdicts settled at each tier by this parser, the judge's own counts
+        # cover every parser sharing it
+        self.tier_counts = [0] * len(self.judge.tiers)
+        # links skipped because the run budget ran out, so they can be judged later
+        self.deferred_links = []
+        # optional per-domain profiles carried across runs. for well-known domains
+        # they're injected as context and, when reuse_domain_metrics is set, used
+        # to skip the domain metrics
+        self.domain_store = domain_store
+        self.reuse_domain_metrics = reuse_domain_metrics
+        # links with the same content are judged once per post and the verdict
+        # reused. fingerprint indexes and verdicts are kept per post (keyed by its
+        # query) and evicted once the post is done. futures let concurrent
+        # duplicates wait for the first verdict instead of judging it again
+        self.fingerprint_max_distance = fingerprint_max_distance
+        self.fingerprints: Dict[str, ContentFingerprintIndex] = {}
+        self.judged_content: Dict[str, Dict[str, asyncio.Future]] = {}
+        self.reused_verdicts = 0
 
     def parse_blogs(self, blog_id: str):
         blogs = self.blogger.get_all_posts(blog_id)
@@ -19,15 +69,142 @@ class BloggerParser:
             self.logger.info(f"Processing blog: {blog.get('title', '')}")
             obls = blog.get("outbound_links", [])
             link_data = []
+            link_articles = []
             for link in obls:
                 article_data = self.article.scrape_article(link)
                 article_string = self.article.format_links_data_into_string(
                     article_data
                 )
                 link_data.append(article_string)
+                link_articles.append(article_data)
             blogs[idx]["outbound_links_data"] = link_data
+            blogs[idx]["outbound_links_articles"] = link_articles
         return blogs
 
+    def build_query(self, blog: dict) -> str:
+        return self.judge.build_prefix(
+            blog.get("content", ""), blog.get("outbound_links", [])
+        )
+
+    def estimate_link_tokens(self, query: str, link_str: str) -> int:
+        return self.judge.estimate_input_tokens([query, link_str], self.budget)
+
+    async def judge_link(
+        self,
+        blog_title: str,
+        query: str,
+        link: str,
+        link_str: str,
+        article_data: Optional[Dict[str, Any]] = None,
+        cached_content: Optional[str] = None,
+        content_key: Optional[str] = None,
+    ) -> Optional[JudgeOutput]:
+        """
+        judges a single outbound link, deferring it if the run budget can't cover it
+        and recording the verdict in the link's domain profile. links whose content
+        was already judged for the same post reuse that verdict
+
+        returns:
+            the verdict, or None if the link was deferred or the judge failed
+        """
+        if content_key is None:
+            return await self._judge_link(
+                blog_title, query, link, link_str, article_data, cached_content
+            )
+
+        judged = self.judged_content.setdefault(query, {})
+        while (pending := judged.get(content_key)) is not None:
+            # shielded so a cancelled duplicate doesn't cancel the shared future
+            res = await asyncio.shield(pending)
+            if res is not None:
+                self.reused_verdicts += 1
+                self.logger.info(f"reusing the verdict for {content_key} for {link}")
+                return res.model_copy(update={"link_url": link})
+            # the attempt failed or was deferred and its entry was removed. the
+            # first waiter to wake up retries, the others wait on its attempt
+
+        future = asyncio.get_running_loop().create_future()
+        judged[content_key] = future
+        res = None
+        try:
+            res = await self._judge_link(
+                blog_title, query, link, link_str, article_data, cached_content
+            )
+        finally:
+            if res is None and judged.get(content_key) is future:
+                del judged[content_key]
+            if not future.done():
+                future.set_result(res)
+        return res
+
+    def content_key(self, query: str, article_data: Dict[str, Any]) -> Optional[str]:
+        """
+        indexes a scraped link in its post's fingerprint index, returning the key
+        of the content it duplicates
+        """
+        if query not in self.fingerprints:
+            self.fingerprints[query] = ContentFingerprintIndex(
+                max_distance=self.fingerprint_max_distance
+            )
+        return self.fingerprints[query].add(article_data)
+
+    def evict_post(self, query: str):
+        """
+        drops the fingerprints and verdicts kept for deduplicating a post's links
+        once it is done
+        """
+        self.fingerprints.pop(query, None)
+        self.judged_content.pop(query, None)
+
+    async def _judge_link(
+        self,
+        blog_title: str,
+        query: str,
+        link: str,
+        link_str: str,
+        article_data: Optional[Dict[str, Any]] = None,
+        cached_content: Optional[str] = None,
+    ) -> Optional[JudgeOutput]:
+        if not self.budget.can_afford(
+            self.judge.model_name, self.estimate_link_tokens(query, link_str)
+        ):
+            self.logger.warning(f"deferring {link}, run budget exhausted")
+            self.deferred_links.append({"blog_title": blog_title, "link_url": link})
+            return None
+
+        # the profile is only shown to the judge once the domain is well-known, so
+        # the verdicts that make it well-known are independent of the profile
+        domain_context = None
+        prior_metrics = None
+        if (
+            self.domain_store is not None
+            and self.domain_store.is_well_known(link)
+            and not self.domain_store.should_refresh()
+        ):
+            domain_context = self.domain_store.format_context(link)
+            if self.reuse_domain_metrics:
+                prior_metrics = self.domain_store.prior_metrics(link)
+
+        res = await self.judge.judge(
+            link_url=link,
+            query=query,
+            context=f"This is the content of the outbound link: {link_str}",
+            domain_context=domain_context,
+            prior_metrics=prior_metrics,
+            cached_content=cached_content,
+            budget=self.budget,
+            tier_counts=self.tier_counts,
+        )
+        if not isinstance(res, JudgeOutput):
+            self.logger.error(f"no judge output for {link}")
+            return None
+
+        # verdicts anchored on the profile (injected or reused scores) would shrink
+        # its spread towards the prior, so only independent verdicts count
+        if self.domain_store is not None and domain_context is None:
+            self.domain_store.update(link, res, article_data)
+        return res
+
     async def process_blogs(self, blog_id: str):
         blogs = self.parse_blogs(blog_id)
         blog_dict = {}
@@ -36,17 +213,39 @@ class BloggerParser:
         for blog in blogs:
             blog_title = blog.get("title", "")
             blog_dict[blog_title] = []
-            article_content = blog.get("content", "")
             obls = blog.get("outbound_links", [])
             obls_data = blog.get("outbound_links_data", [])
+            obls_articles = blog.get("outbound_links_articles", [])
+
+            query = self.build_query(blog)
+            cached_content = await self.judge.create_post_cache(
+                query, len(obls), self.budget
+            )
+            obls_keys = [
+                self.content_key(query, article_data) for article_data in obls_articles
+            ]
+            links = list(zip(obls, obls_data, obls_articles, obls_keys))
 
             # per outbound link, invoke judge agent
-            for link_str in obls_data:
-                res = await self.judge.invoke(
-                    query=f"This is the content of the main blog post: {article_content}\n\n And these are all the outbound links in the article: {obls}",
-                    context=f"This is the content of the outbound link: {link_str}",
+            while links:
+                # re-checked before every link, so once the budget runs low partway
+                # through a post its cheapest remaining links are judged first
+                links = self.budget.prioritize(
+                    links, lambda link: self.estimate_link_tokens(query, link[1])
+                )
+                link, link_str, article_data, content_key = links.pop(0)
+                res = await self.judge_link(
+                    blog_title,
+                    query,
+                    link,
+                    link_str,
+                    article_data,
+                    cached_content,
+                    content_key,
                 )
-                blog_dict[blog_title].append(res.model_dump())
+                if res is not None:
+                    blog_dict[blog_title].append(res.model_dump())
+            self.evict_post(query)
 
         return blog_dict
 
@@ -58,30 +257,197 @@ class BloggerParser:
         for person, blog_id in blog_ids:
             blog_results = await self.process_blogs(blog_id)
             all_blogs_dict[person] = blog_results
+        if self.domain_store is not None:
+            self.domain_store.save()
+        self.logger.info(f"Run usage: {self.budget.summary()}")
+        self.logger.info(f"Verdicts settled per judge tier: {self.tier_counts}")
+        self.logger.info(
+            f"Verdicts reused for duplicate content: {self.reused_verdicts}"
+        )
         return all_blogs_dict
 
-    def flatten_results_to_df(self, results_dict: dict) -> pd.DataFrame:
-        rows = []
-        for person, blogs in results_dict.items():
-            for blog_title, links in blogs.items():
-                for link_data in links:
-                    row = {
-                        "person": person,
-                        "blog_title": blog_title,
-                        "link_url": link_data.get("link_url", ""),
-                        "overall_score": link_data.get("overall_score", 0),
-                    }
-
-                    metrics = link_data.get("metrics", {})
-                    for metric_name, metric_data in metrics.items():
-                        row[f"{metric_name}_score"] = metric_data.get("score", 0)
-                        row[f"{metric_name}_justification"] = metric_data.get(
-                            "justification", ""
+    async def stream_all_blogs(
+        self,
+        blog_ids: List[Tuple[str]],
+        concurrency: int = 8,
+        buffer_size: int = 32,
+    ) -> AsyncIterator[TaggedJudgeOutput]:
+        """
+        scrapes and judges links concurrently, yielding each verdict as soon as it
+        completes. results arrive out of order, tagged with person, blog title and
+        link index
+
+        Args:
+            blog_ids (List[Tuple[str]]): (person, blog_id) pairs to process
+            concurrency (int): Maximum number of links scraped and judged at once
+            buffer_size (int): Maximum number of finished verdicts waiting for the
+                consumer. workers keep their slot until their verdict is buffered, so
+                once it is full no new links are started and slow consumers apply backpressure
+
+        usage:
+            async for result in parser.stream_all_blogs(blog_ids):
+                ...
+        """
+        results = asyncio.Queue(maxsize=buffer_size)
+        semaphore = asyncio.Semaphore(concurrency)
+        done = object()
+        errors = []
+        # links of each post not finished yet, its verdicts are evicted at zero
+        remaining_links: Dict[str, int] = {}
+
+        async def process_link(
+            person: str,
+            blog_title: str,
+            query: str,
+            cached_content: Optional[str],
+            link_index: int,
+            link: str,
+            article_data: Optional[Dict[str, Any]] = None,
+        ):
+            # the slot was acquired by the producer and is held until the verdict
+            # is buffered, so a full buffer stops new links from being started
+            try:
+                if article_data is None:
+                    article_data = await asyncio.to_thread(
+                        self.article.scrape_article, link
+                    )
+                link_str = self.article.format_links_data_into_string(article_data)
+                res = await self.judge_link(
+                    blog_title,
+                    query,
+                    link,
+                    link_str,
+                    article_data,
+                    cached_content,
+                    self.content_key(query, article_data),
+                )
+                if res is not None:
+                    await results.put(
+                        TaggedJudgeOutput(
+                            person=person,
+                            blog_title=blog_title,
+                            link_index=link_index,
+                            output=res,
                         )
+                    )
+            finally:
+                remaining_links[query] -= 1
+                if not remaining_links[query]:
+                    del remaining_links[query]
+                    self.evict_post(query)
+                semaphore.release()
 
-                    rows.append(row)
+        async def scrape_all(
+            links: List[Tuple[int, str]],
+        ) -> Dict[int, Dict[str, Any]]:
+            scrape_slots = asyncio.Semaphore(concurrency)
 
-        return pd.DataFrame(rows)
+            async def scrape(link: str) -> Dict[str, Any]:
+                async with scrape_slots:
+                    return await asyncio.to_thread(self.article.scrape_article, link)
+
+            articles = await asyncio.gather(*(scrape(link) for _, link in links))
+            return {index: article for (index, _), article in zip(links, articles)}
+
+        async def produce():
+            # only the links in flight have a task, finished ones remove themselves
+            tasks = set()
+
+            def finish(task: asyncio.Task):
+                tasks.discard(task)
+                if not task.cancelled() and task.exception() is not None:
+                    errors.append(task.exception())
+
+            try:
+                for person, blog_id in blog_ids:
+                    blogs = await asyncio.to_thread(self.blogger.get_all_posts, blog_id)
+                    for blog in blogs:
+                        blog_title = blog.get("title", "")
+                        self.logger.info(f"Processing blog: {blog_title}")
+                        obls = blog.get("outbound_links", [])
+                        query = self.build_query(blog)
+                        cached_content = await self.judge.create_post_cache(
+                            query, len(obls), self.budget
+                        )
+                        if obls:
+                            remaining_links[query] = remaining_links.get(
+                                query, 0
+                            ) + len(obls)
+                        pending = list(enumerate(obls))
+                        # link index -> scraped article, filled once the budget runs low
+                        scraped: Dict[int, Dict[str, Any]] = {}
+                        while pending:
+                            # links are started lazily, one per free slot
+                            await semaphore.acquire()
+                            if errors:
+                                semaphore.release()
+                                raise errors[0]
+                            if self.budget.is_nearly_exhausted:
+                                # costs are only known once scraped, so the rest of the
+                                # post is scraped up front and its cheapest links go first
+                                if not scraped:
+                                    scraped = await scrape_all(pending)
+                                pending = self.budget.prioritize(
+                                    pending,
+                                    lambda item: self.estimate_link_tokens(
+                                        query,
+                                        self.article.format_links_data_into_string(
+                                            scraped[item[0]]
+                                        ),
+                                    ),
+                                )
+                            link_index, link = pending.pop(0)
+                            task = asyncio.create_task(
+                                process_link(
+                                    person,
+                                    blog_title,
+                                    query,
+                                    cached_content,
+                                    link_index,
+                                    link,
+                                    scraped.pop(link_index, None),
+                                )
+                            )
+                            tasks.add(task)
+                            task.add_done_callback(finish)
+                await asyncio.gather(*tasks)
+                if errors:
+                    raise errors[0]
+            except asyncio.CancelledError:
+                for task in list(tasks):
+                    task.cancel()
+                raise
+            except Exception as e:
+                for task in list(tasks):
+                    task.cancel()
+                self.logger.error(f"streaming run failed: {e}")
+                if e not in errors:
+                    errors.insert(0, e)
+            await results.put(done)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (item := await results.get()) is not done:
+                yield item
+            if errors:
+                raise errors[0]
+            if self.domain_store is not None:
+                self.domain_store.save()
+            self.logger.info(f"Run usage: {self.budget.summary()}")
+            self.logger.info(
+                f"Verdicts reused for duplicate content: {self.reused_verdicts}"
+            )
+        finally:
+            # the consumer stopped early, stop scraping and judging the remaining links
+            if not producer.done():
+                producer.cancel()
+                with suppress(asyncio.CancelledError):
+                    await producer
+            for query in remaining_links:
+                self.evict_post(query)
+
+    def flatten_results_to_df(self, results_dict: dict) -> pd.DataFrame:
+        return results_frame_from_dict(results_dict)
 
     def save(
         self,
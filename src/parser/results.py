@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+from typing import Iterable, List, Dict, Optional
+
+from src.outputs import LinkMetrics, TaggedJudgeOutput
+from src.tools.domain import extract_domain
+
+METRIC_NAMES = list(LinkMetrics.model_fields)
+SCORE_COLUMNS = [f"{metric}_score" for metric in METRIC_NAMES]
+JUSTIFICATION_COLUMNS = [f"{metric}_justification" for metric in METRIC_NAMES]
+
+
+def _empty_columns(include_justifications: bool) -> Dict[str, List]:
+    columns = {"person": [], "blog_title": [], "link_url": [], "overall_score": []}
+    for metric in METRIC_NAMES:
+        columns[f"{metric}_score"] = []
+        if include_justifications:
+            columns[f"{metric}_justification"] = []
+    return columns
+
+
+def _frame_from_columns(columns: Dict[str, List]) -> pd.DataFrame:
+    """
+    builds the results frame in one shot from column lists, using categorical
+    dtypes for the repeated string columns and uint8 for the 0-10 scores
+    """
+    df = pd.DataFrame(columns)
+    if "overall_score" not in df:
+        # same average as JudgeOutput.overall_score, computed for all rows at once
+        df.insert(3, "overall_score", df[SCORE_COLUMNS].mean(axis=1).round(2))
+    df["person"] = df["person"].astype("category")
+    df["blog_title"] = df["blog_title"].astype("category")
+    df["link_url"] = df["link_url"].astype(str)
+    df["overall_score"] = df["overall_score"].astype("float32")
+    df[SCORE_COLUMNS] = df[SCORE_COLUMNS].astype("uint8")
+    # parsed once per unique url, with the same keys as the domain profiles
+    domains = {url: extract_domain(url) for url in df["link_url"].unique()}
+    df["domain"] = df["link_url"].map(domains).astype("category")
+    return df
+
+
+def results_frame_from_outputs(
+    records: Iterable[TaggedJudgeOutput],
+    include_justifications: bool = True,
+) -> pd.DataFrame:
+    """
+    builds the results frame from tagged judge outputs, e.g. collected from
+    BloggerParser.stream_all_blogs
+    """
+    columns = _empty_columns(include_justifications)
+    del columns["overall_score"]
+    for record in records:
+        output = record.output
+        columns["person"].append(record.person)
+        columns["blog_title"].append(record.blog_title)
+        columns["link_url"].append(output.link_url)
+        for metric, metric_score in output.metrics:
+            columns[f"{metric}_score"].append(metric_score.score)
+            if include_justifications:
+                columns[f"{metric}_justification"].append(metric_score.justification)
+    return _frame_from_columns(columns)
+
+
+def results_frame_from_dict(
+    results_dict: dict,
+    include_justifications: bool = True,
+) -> pd.DataFrame:
+    """
+    builds the results frame from the nested {person: {blog_title: [link_data]}}
+    dict returned by BloggerParser.process_all_blogs
+    """
+    columns = _empty_columns(include_justifications)
+    for person, blogs in results_dict.items():
+        for blog_title, links in blogs.items():
+            for link_data in links:
+                columns["person"].append(person)
+                columns["blog_title"].append(blog_title)
+                columns["link_url"].append(link_data.get("link_url", ""))
+                columns["overall_score"].append(link_data.get("overall_score", 0))
+                metrics = link_data.get("metrics", {})
+                for metric in METRIC_NAMES:
+                    metric_data = metrics.get(metric, {})
+                    columns[f"{metric}_score"].append(metric_data.get("score", 0))
+                    if include_justifications:
+                        columns[f"{metric}_justification"].append(
+                            metric_data.get("justification", "")
+                        )
+    return _frame_from_columns(columns)
+
+
+def metric_means(df: pd.DataFrame, by: str) -> pd.DataFrame:
+    """
+    mean of every metric score and the overall score per group, with the number
+    of links in each group
+    """
+    grouped = df.groupby(by, observed=True)
+    means = grouped[SCORE_COLUMNS + ["overall_score"]].mean()
+    means.insert(0, "n_links", grouped.size())
+    return means
+
+
+def person_metric_means(df: pd.DataFrame) -> pd.DataFrame:
+    return metric_means(df, "person")
+
+
+def domain_metric_means(df: pd.DataFrame, min_links: int = 1) -> pd.DataFrame:
+    means = metric_means(df, "domain")
+    return means[means["n_links"] >= min_links].sort_values("n_links", ascending=False)
+
+
+def score_distribution(
+    df: pd.DataFrame,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    number of links at each score 0-10 for each metric score column
+    """
+    columns = columns or SCORE_COLUMNS
+    return pd.DataFrame(
+        {col: np.bincount(df[col].to_numpy(), minlength=11) for col in columns},
+        index=pd.RangeIndex(11, name="score"),
+    )
+
+
+def worst_links(
+    df: pd.DataFrame,
+    n: int = 20,
+    metric: str = "overall_score",
+) -> pd.DataFrame:
+    """
+    the n lowest scoring links for a metric (overall score by default)
+    """
+    return df.nsmallest(n, metric)[
+        ["person", "blog_title", "domain", "link_url", metric]
+    ]
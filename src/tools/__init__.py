@@ -1,2 +1,4 @@
 from .blogger import *
 from .article import *
+from .domain import *
+from .fingerprint import *
@@ -1,16 +1,34 @@
 import dateutil.parser
+import io
 import requests
+import time
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
 from typing import Optional, Dict, Any
 from newspaper import Article
+from pypdf import PdfReader
 
 from src.utils import setup_logger
 
 
 class ArticleCrawler:
-    def __init__(self):
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        max_body_bytes: int = 5 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        max_pdf_pages: int = 30,
+        max_fetch_seconds: float = 30.0,
+    ):
         self.logger = setup_logger(f"[{self.__class__.__name__}]")
+        # injected sessions let crawlers share pooled keep-alive connections
+        self.session = session or requests.Session()
+        # responses are streamed and never held in memory beyond this size
+        self.max_body_bytes = max_body_bytes
+        self.chunk_size = chunk_size
+        self.max_pdf_pages = max_pdf_pages
+        # the request timeout only bounds each socket read, this bounds the download
+        self.max_fetch_seconds = max_fetch_seconds
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
         }
@@ -118,24 +136,225 @@ class ArticleCrawler:
 
         return None
 
+    def _extract_publisher(self, soup: BeautifulSoup) -> Optional[str]:
+        """
+        extracts the publisher/site name from meta tags or json-ld structured data
+        """
+        import json
+
+        for attr, value in [
+            ("property", "og:site_name"),
+            ("name", "application-name"),
+            ("name", "publisher"),
+        ]:
+            meta = soup.find("meta", attrs={attr: value})
+            if meta and meta.get("content"):
+                return meta.get("content").strip()
+
+        scripts = soup.find_all("script", type="application/ld+json")
+        for script in scripts:
+            try:
+                data = json.loads(script.string)
+                items = data if isinstance(data, list) else [data]
+                for item in items:
+                    publisher = (
+                        item.get("publisher") if isinstance(item, dict) else None
+                    )
+                    if isinstance(publisher, dict) and publisher.get("name"):
+                        return publisher["name"].strip()
+                    if isinstance(publisher, str) and publisher:
+                        return publisher.strip()
+            except:
+                continue
+
+        return None
+
+    def _content_kind(self, content_type: str, head: bytes) -> Optional[str]:
+        """
+        decides how to extract a response from its content type and first bytes,
+        since servers often send missing or wrong content types
+
+        returns:
+            "html", "pdf", "text", or None for content we can't extract text from
+        """
+        if head.startswith(b"%PDF-"):
+            return "pdf"
+        start = head.lstrip()[:64].lower()
+        if content_type in ("text/html", "application/xhtml+xml") or start.startswith(
+            (b"<!doctype html", b"<html", b"<?xml")
+        ):
+            return "html"
+        if content_type == "application/pdf":
+            return "pdf"
+        if content_type.startswith("text/"):
+            return "text"
+        return None
+
+    def _decode(self, body: bytes, charset: Optional[str]) -> str:
+        """
+        decodes a body using the header charset, or else the <meta charset>, a
+        byte order mark or a guess, as newspaper3k did when it fetched pages itself
+        """
+        dammit = UnicodeDammit(
+            body,
+            known_definite_encodings=[charset] if charset else [],
+            is_html=True,
+        )
+        if dammit.unicode_markup is not None:
+            return dammit.unicode_markup
+        return body.decode("utf-8", errors="replace")
+
+    def _iter_body(self, response: requests.Response):
+        """
+        yields the decoded body as it arrives. unlike iter_content, which blocks
+        until a full chunk is read, each chunk is the result of a single socket
+        read, so a server trickling bytes can't hold a read past the deadline
+        """
+        while chunk := response.raw.read1(self.chunk_size, decode_content=True):
+            yield chunk
+
+    def _fetch(self, url: str) -> Dict[str, Any]:
+        """
+        streams a response, reading at most max_body_bytes for at most
+        max_fetch_seconds. non-text content is dropped after the first chunk and
+        oversized pdfs before any body is read
+        """
+        deadline = time.monotonic() + self.max_fetch_seconds
+        with self.session.get(
+            url, headers=self.headers, timeout=10, stream=True
+        ) as response:
+            response.raise_for_status()
+
+            raw_content_type = response.headers.get("Content-Type", "")
+            content_type = raw_content_type.split(";")[0].strip().lower()
+            charset = None
+            for param in raw_content_type.split(";")[1:]:
+                key, _, value = param.strip().partition("=")
+                if key.lower() == "charset":
+                    charset = value.strip("\"' ")
+
+            fetched = {
+                "kind": None,
+                "content_type": content_type,
+                "charset": charset,
+                "body": b"",
+                "truncated": False,
+                # after redirects, so mirrors and shorteners resolve to one url
+                "final_url": response.url or url,
+            }
+
+            chunks = self._iter_body(response)
+            head = next(chunks, b"")
+            fetched["kind"] = self._content_kind(content_type, head)
+            if fetched["kind"] is None:
+                self.logger.warning(
+                    f"skipping {url}, unsupported content: {content_type}"
+                )
+                return fetched
+
+            content_length = response.headers.get("Content-Length", "")
+            if (
+                fetched["kind"] == "pdf"
+                and content_length.isdigit()
+                and int(content_length) > self.max_body_bytes
+            ):
+                # a truncated pdf can't be parsed, so don't download it at all
+                self.logger.warning(f"skipping {url}, pdf of {content_length} bytes")
+                fetched["kind"] = None
+                return fetched
+
+            body = bytearray(head[: self.max_body_bytes])
+            for chunk in chunks:
+                if len(body) + len(chunk) > self.max_body_bytes:
+                    body.extend(chunk[: self.max_body_bytes - len(body)])
+                    fetched["truncated"] = True
+                    self.logger.warning(
+                        f"{url} exceeds {self.max_body_bytes} bytes, keeping the first part"
+                    )
+                    break
+                body.extend(chunk)
+                if time.monotonic() > deadline:
+                    fetched["truncated"] = True
+                    self.logger.warning(
+                        f"{url} took over {self.max_fetch_seconds}s, keeping the first part"
+                    )
+                    break
+
+        if fetched["truncated"]:
+            if fetched["kind"] == "pdf":
+                fetched["kind"] = None
+        fetched["body"] = bytes(body)
+        return fetched
+
+    def _empty_result(
+        self, url: str, final_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        return {
+            "url": url,
+            "final_url": final_url or url,
+            "publish_date": None,
+            "update_date": None,
+            "content": None,
+            "title": None,
+            "authors": [],
+            "publisher": None,
+        }
+
+    def _parse_pdf(self, url: str, final_url: str, body: bytes) -> Dict[str, Any]:
+        """
+        extracts text and metadata from a pdf using pypdf
+        """
+        result = self._empty_result(url, final_url)
+        reader = PdfReader(io.BytesIO(body))
+        pages = reader.pages[: self.max_pdf_pages]
+        result["content"] = "\n".join(page.extract_text() or "" for page in pages)
+
+        metadata = reader.metadata
+        if metadata:
+            result["title"] = metadata.title
+            if metadata.author:
+                result["authors"] = [metadata.author]
+            try:
+                if metadata.creation_date:
+                    result["publish_date"] = metadata.creation_date.isoformat()
+                if metadata.modification_date:
+                    result["update_date"] = metadata.modification_date.isoformat()
+            except Exception:
+                pass
+        return result
+
     def scrape_article(self, url: str) -> Dict[str, Any]:
         """
-        scrapes article content from a given url
+        scrapes article content from a given url. html goes through newspaper3k,
+        pdfs through pypdf and plain text is used as is, anything else is skipped
         """
         try:
             self.logger.info(f"scraping article from: {url}")
 
+            # fetch once and share the body between the extractors
+            fetched = self._fetch(url)
+            kind = fetched["kind"]
+            final_url = fetched["final_url"]
+            if kind is None:
+                return self._empty_result(url, final_url)
+            if kind == "pdf":
+                return self._parse_pdf(url, final_url, fetched["body"])
+
+            text = self._decode(fetched["body"], fetched["charset"])
+            if kind == "text":
+                result = self._empty_result(url, final_url)
+                result["content"] = text
+                return result
+
             # use newspaper3k for article extraction
             article = Article(url)
-            article.download()
+            article.download(input_html=text)
             article.parse()
 
             # extract metadata
             content = article.text
 
-            # get the html for date extraction
-            response = requests.get(url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(response.content, "html.parser")
+            soup = BeautifulSoup(text, "html.parser")
 
             # try multiple methods to extract dates
             publish_date = (
@@ -145,27 +364,23 @@ class ArticleCrawler:
             )
 
             update_date = self._extract_update_date(soup)
+            publisher = self._extract_publisher(soup)
 
             result = {
                 "url": url,
+                "final_url": final_url,
                 "publish_date": publish_date,
                 "update_date": update_date,
                 "content": content,
                 "title": article.title,
                 "authors": article.authors,
+                "publisher": publisher,
             }
             return result
 
         except Exception as e:
             self.logger.error(f"failed to scrape article from {url}: {str(e)}")
-            return {
-                "url": url,
-                "publish_date": None,
-                "update_date": None,
-                "content": None,
-                "title": None,
-                "authors": [],
-            }
+            return self._empty_result(url)
 
     def format_links_data_into_string(self, article_data: Dict[str, Any]) -> str:
         """
@@ -183,6 +398,10 @@ class ArticleCrawler:
         else:
             section_parts.append("Authors: N/A")
 
+        publisher = article_data.get("publisher")
+        if publisher:
+            section_parts.append(f"Publisher: {publisher}")
+
         section_parts.append(f"Published: {article_data.get('publish_date', 'N/A')}")
 
         update_date = article_data.get("update_date")
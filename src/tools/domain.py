@@ -0,0 +1,250 @@
+import json
+import math
+import os
+import random
+import time
+
+from contextlib import contextmanager, suppress
+
+from typing import Optional, Dict, Any
+from urllib.parse import urlparse
+
+from src.outputs import DOMAIN_METRICS, JudgeOutput, MetricScore
+from src.utils import setup_logger
+
+
+def extract_domain(url: str) -> str:
+    """lowercased host of a url without the leading www."""
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class DomainProfileStore:
+    """
+    persistent per-domain profiles built from prior judge verdicts
+
+    each profile keeps running sums of the domain metrics (source credibility,
+    e-e-a-t alignment) and the authors/publishers seen in scraped metadata. once
+    a domain is well-known, later runs can inject a compact summary into the
+    judge prompt, or skip re-judging its domain metrics altogether. only
+    verdicts made without the profile should be added, otherwise the profile
+    confirms itself, so a refresh_rate share of the links of well-known domains
+    is still judged independently. profiles keep at most max_samples verdicts
+    worth of weight, older verdicts fading out as new ones come in
+
+    saves merge the verdicts added since the last save into the file under a
+    lock, so parsers sharing a path don't drop each other's updates
+
+    @methods:
+    - load(): loads profiles from disk
+    - save(): merges the new verdicts into the profiles on disk
+    - update(url, output, article_data): adds a verdict to the domain's profile
+    - should_refresh(): whether to judge a link of a well-known domain independently
+    - format_context(url): compact profile summary for the judge prompt
+    - is_well_known(url): whether the domain metrics can be reused for this url
+    - prior_metrics(url): the reusable domain metric scores for this url
+    """
+
+    def __init__(
+        self,
+        path: str = "results/domain_profiles.json",
+        min_samples: int = 5,
+        max_stddev: float = 1.0,
+        top_k: int = 3,
+        max_samples: int = 50,
+        refresh_rate: float = 0.1,
+    ):
+        self.logger = setup_logger(f"[{self.__class__.__name__}]")
+        self.path = path
+        self.min_samples = min_samples
+        self.max_stddev = max_stddev
+        self.top_k = top_k
+        self.max_samples = max_samples
+        self.refresh_rate = refresh_rate
+        self.profiles: Dict[str, Dict[str, Any]] = self.load()
+        # verdicts added since the last save, merged into the file on save
+        self.pending: Dict[str, Dict[str, Any]] = {}
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}, domains={len(self.profiles)}, path={self.path}>"
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"failed to load domain profiles from {self.path}: {e}")
+            return {}
+
+    @contextmanager
+    def _lock(self, timeout: float = 10.0):
+        """
+        exclusive lock file next to the store, broken after timeout seconds in
+        case a crashed writer left it behind
+        """
+        lock_path = f"{self.path}.lock"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                if time.monotonic() < deadline:
+                    time.sleep(0.05)
+                    continue
+                self.logger.warning(f"breaking stale lock {lock_path}")
+                with suppress(FileNotFoundError):
+                    os.remove(lock_path)
+                deadline = time.monotonic() + timeout
+        try:
+            yield
+        finally:
+            os.close(fd)
+            with suppress(FileNotFoundError):
+                os.remove(lock_path)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock():
+            # merge into what's on disk now, other parsers may have saved since
+            profiles = self.load()
+            for domain, delta in self.pending.items():
+                self._merge(profiles.setdefault(domain, self._new_profile()), delta)
+            # write to a temp file first so an interrupted save can't corrupt the store
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(profiles, f, indent=2)
+            os.replace(tmp_path, self.path)
+        self.profiles = profiles
+        self.pending = {}
+        self.logger.info(f"Saved {len(self.profiles)} domain profiles to {self.path}")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.profiles.get(extract_domain(url))
+
+    def update(
+        self,
+        url: str,
+        output: JudgeOutput,
+        article_data: Optional[Dict[str, Any]] = None,
+    ):
+        domain = extract_domain(url)
+        if not domain:
+            return
+
+        delta = self._new_profile()
+        delta["n"] = 1
+        for metric in DOMAIN_METRICS:
+            score = getattr(output.metrics, metric).score
+            delta["metrics"][metric] = {"sum": score, "sum_sq": score * score}
+
+        article_data = article_data or {}
+        for author in article_data.get("authors") or []:
+            delta["authors"][author] = 1
+        publisher = article_data.get("publisher")
+        if publisher:
+            delta["publishers"][publisher] = 1
+
+        self._merge(self.profiles.setdefault(domain, self._new_profile()), delta)
+        self._merge(
+            self.pending.setdefault(domain, self._new_profile()), delta, cap=False
+        )
+
+    def should_refresh(self) -> bool:
+        """
+        true for a refresh_rate share of calls, the link is then judged without
+        the profile so well-known domains keep getting independent verdicts
+        """
+        return random.random() < self.refresh_rate
+
+    def _new_profile(self) -> Dict[str, Any]:
+        return {
+            "n": 0,
+            "metrics": {
+                metric: {"sum": 0.0, "sum_sq": 0.0} for metric in DOMAIN_METRICS
+            },
+            "authors": {},
+            "publishers": {},
+        }
+
+    def _merge(self, profile: Dict[str, Any], delta: Dict[str, Any], cap: bool = True):
+        profile["n"] += delta["n"]
+        for metric in DOMAIN_METRICS:
+            for key in ("sum", "sum_sq"):
+                profile["metrics"][metric][key] += delta["metrics"][metric][key]
+        for field in ("authors", "publishers"):
+            for name, count in delta[field].items():
+                profile[field][name] = profile[field].get(name, 0) + count
+
+        # past max_samples the sums are scaled down, so older verdicts fade out
+        # and the profile keeps following the domain
+        if cap and profile["n"] > self.max_samples:
+            scale = self.max_samples / profile["n"]
+            profile["n"] = self.max_samples
+            for metric_sums in profile["metrics"].values():
+                metric_sums["sum"] *= scale
+                metric_sums["sum_sq"] *= scale
+
+    def _stats(self, profile: Dict[str, Any], metric: str):
+        n = profile["n"]
+        metric_sums = profile["metrics"][metric]
+        mean = metric_sums["sum"] / n
+        variance = max(metric_sums["sum_sq"] / n - mean * mean, 0.0)
+        return mean, math.sqrt(variance)
+
+    def _top(self, counts: Dict[str, int]):
+        return sorted(counts, key=counts.get, reverse=True)[: self.top_k]
+
+    def format_context(self, url: str) -> Optional[str]:
+        """
+        compact summary of what earlier runs found about the link's domain
+        """
+        profile = self.get(url)
+        if not profile or not profile["n"]:
+            return None
+
+        scores = []
+        for metric in DOMAIN_METRICS:
+            mean, stddev = self._stats(profile, metric)
+            scores.append(f"{metric} avg {mean:.1f} (sd {stddev:.1f})")
+
+        parts = [
+            f"Prior verdicts for {extract_domain(url)} ({profile['n']} links): "
+            + ", ".join(scores)
+        ]
+        publishers = self._top(profile["publishers"])
+        if publishers:
+            parts.append(f"Publisher: {', '.join(publishers)}")
+        authors = self._top(profile["authors"])
+        if authors:
+            parts.append(f"Frequent authors: {', '.join(authors)}")
+        return "\n".join(parts)
+
+    def is_well_known(self, url: str) -> bool:
+        """
+        true once the domain has enough prior verdicts and they agree closely
+        """
+        profile = self.get(url)
+        if not profile or profile["n"] < self.min_samples:
+            return False
+        return all(
+            self._stats(profile, metric)[1] <= self.max_stddev
+            for metric in DOMAIN_METRICS
+        )
+
+    def prior_metrics(self, url: str) -> Dict[str, MetricScore]:
+        profile = self.get(url)
+        domain = extract_domain(url)
+        prior = {}
+        for metric in DOMAIN_METRICS:
+            mean, stddev = self._stats(profile, metric)
+            prior[metric] = MetricScore(
+                score=round(mean),
+                justification=f"Reused from the domain profile of {domain} "
+                f"(avg {mean:.1f}, sd {stddev:.1f} over {profile['n']} links)",
+            )
+        return prior
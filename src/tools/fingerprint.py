@@ -0,0 +1,144 @@
+import hashlib
+import numpy as np
+import re
+
+from collections import Counter
+from typing import Optional, Dict, List, Tuple, Any
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from src.tools.domain import extract_domain
+from src.utils import setup_logger
+
+SIMHASH_BITS = 64
+
+
+def normalize_url(url: str) -> str:
+    """
+    host without www., path without trailing slash and query without tracking
+    params, so trivially different urls of the same page compare equal
+    """
+    parsed = urlparse(url)
+    query = [
+        (key, value)
+        for key, value in parse_qsl(parsed.query)
+        if not key.lower().startswith("utm_")
+    ]
+    normalized = f"{extract_domain(url)}{parsed.path.rstrip('/')}"
+    if query:
+        normalized += f"?{urlencode(sorted(query))}"
+    return normalized
+
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    64 bit simhash of the word shingles of a text. near-identical texts get
+    fingerprints that differ in only a few bits
+    """
+    words = re.findall(r"\w+", text.lower())
+    if len(words) >= shingle_size:
+        shingles = Counter(
+            " ".join(words[i : i + shingle_size])
+            for i in range(len(words) - shingle_size + 1)
+        )
+    else:
+        shingles = Counter(words)
+    if not shingles:
+        return 0
+
+    hashes = np.array(
+        [
+            int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "big")
+            for s in shingles
+        ],
+        dtype=">u8",
+    )
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, SIMHASH_BITS)
+    weights = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+    # each bit is set if the shingles with that bit set outweigh the rest
+    votes = 2 * (weights @ bits) - weights.sum()
+    return int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+
+
+class ContentFingerprintIndex:
+    """
+    groups scraped outbound links that point at the same content, e.g. amp
+    pages, mirrors, syndicated copies and redirects, so each is judged once
+
+    links are matched by their final url after redirects, then by the simhash of
+    their extracted content. simhashes are split into max_distance + 1 bands, so
+    any two fingerprints within max_distance bits share at least one exact band
+    and only the links in matching band buckets are compared
+
+    @methods:
+    - add(article_data): indexes a scraped article, returning the key of the content it duplicates
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 3,
+        min_content_chars: int = 500,
+        shingle_size: int = 3,
+    ):
+        self.logger = setup_logger(f"[{self.__class__.__name__}]")
+        self.max_distance = max_distance
+        self.min_content_chars = min_content_chars
+        self.shingle_size = shingle_size
+
+        n_bands = max_distance + 1
+        width = SIMHASH_BITS // n_bands
+        self.bands = [
+            (i * width, SIMHASH_BITS if i == n_bands - 1 else (i + 1) * width)
+            for i in range(n_bands)
+        ]
+        # normalized final url -> content key
+        self.urls: Dict[str, str] = {}
+        # (band index, band value) -> [(fingerprint, content key)]
+        self.buckets: Dict[Tuple[int, int], List[Tuple[int, str]]] = {}
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}, urls={len(self.urls)}, max_distance={self.max_distance}>"
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        return [
+            (i, (fingerprint >> start) & ((1 << (end - start)) - 1))
+            for i, (start, end) in enumerate(self.bands)
+        ]
+
+    def _find_similar(self, fingerprint: int) -> Optional[str]:
+        for band_key in self._band_keys(fingerprint):
+            for candidate, key in self.buckets.get(band_key, []):
+                if (fingerprint ^ candidate).bit_count() <= self.max_distance:
+                    return key
+        return None
+
+    def add(self, article_data: Dict[str, Any]) -> Optional[str]:
+        """
+        indexes a scraped article
+
+        returns:
+            the content key, the normalized final url of the first link seen with
+            the same content, or None if nothing could be scraped from the link
+        """
+        if not article_data.get("content"):
+            return None
+
+        url = normalize_url(article_data.get("final_url") or article_data["url"])
+        if url in self.urls:
+            return self.urls[url]
+
+        content = article_data["content"]
+        key = url
+        # short texts (paywalls, cookie walls, error pages) look alike, so
+        # only the url is used for them
+        if len(content) >= self.min_content_chars:
+            fingerprint = simhash(content, self.shingle_size)
+            similar = self._find_similar(fingerprint)
+            if similar is not None:
+                self.logger.info(f"{article_data['url']} duplicates {similar}")
+                key = similar
+            else:
+                for band_key in self._band_keys(fingerprint):
+                    self.buckets.setdefault(band_key, []).append((fingerprint, key))
+
+        self.urls[url] = key
+        return key
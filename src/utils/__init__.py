@@ -1 +1,2 @@
 from .logger import *
+from .registry import *
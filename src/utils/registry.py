@@ -0,0 +1,155 @@
+import importlib.util
+import httpx
+import requests
+
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any
+
+from src.utils.logger import setup_logger
+
+
+class ClientRegistry:
+    """
+    process wide registry of shared http clients, pydantic-ai models and
+    agent/crawler instances, so concurrent parsers and workers reuse pooled
+    keep-alive connections instead of paying a new TLS handshake per client
+
+    @methods:
+    - get_http_client(provider): pooled httpx.AsyncClient for a provider
+    - get_model(provider, model_name): pydantic-ai model backed by the shared client
+    - get_session(): pooled requests.Session for scraping
+    - get_instance(cls, **kwargs): shared instance of an agent or crawler
+    - aclose(): closes all shared clients
+    """
+
+    def __init__(self, pool_config: Optional[dict] = None):
+        self.logger = setup_logger(f"[{self.__class__.__name__}]")
+        if pool_config is None:
+            # imported here so importing src.utils doesn't read the model config
+            from src.configs import agent_config
+
+            pool_config = agent_config.http_pool_config
+        self.pool_config = pool_config
+        self.http2 = (
+            self.pool_config["http2"] and importlib.util.find_spec("h2") is not None
+        )
+        self.http_clients: Dict[str, httpx.AsyncClient] = {}
+        self.providers: Dict[str, Any] = {}
+        self.models: Dict[str, Any] = {}
+        self.instances: Dict[tuple, Any] = {}
+        self.session: Optional[requests.Session] = None
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}, providers={list(self.http_clients)}, http2={self.http2}>"
+
+    def get_http_client(self, provider: str) -> httpx.AsyncClient:
+        client = self.http_clients.get(provider)
+        if client is None or client.is_closed:
+            if self.pool_config["http2"] and not self.http2:
+                self.logger.warning("h2 is not installed, falling back to http/1.1")
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.pool_config["max_connections"],
+                    max_keepalive_connections=self.pool_config[
+                        "max_keepalive_connections"
+                    ],
+                    keepalive_expiry=self.pool_config["keepalive_expiry"],
+                ),
+                timeout=httpx.Timeout(
+                    timeout=self.pool_config["read_timeout"],
+                    connect=self.pool_config["connect_timeout"],
+                ),
+            )
+            self.http_clients[provider] = client
+        return client
+
+    def get_provider(self, provider: str):
+        """
+        pydantic-ai provider using the shared client, None for providers that
+        aren't wired up here (those fall back to pydantic-ai's own inference)
+        """
+        if provider in self.providers:
+            return self.providers[provider]
+
+        if provider == "google-gla":
+            from pydantic_ai.providers.google import GoogleProvider
+
+            instance = GoogleProvider(http_client=self.get_http_client(provider))
+        elif provider == "openai":
+            from pydantic_ai.providers.openai import OpenAIProvider
+
+            instance = OpenAIProvider(http_client=self.get_http_client(provider))
+        else:
+            instance = None
+
+        self.providers[provider] = instance
+        return instance
+
+    def get_model(self, provider: str, model_name: str):
+        """
+        returns a pydantic-ai model backed by the shared client for the provider,
+        or the "provider:model_name" string if the provider isn't supported here
+        """
+        model_str = f"{provider}:{model_name}"
+        if model_str in self.models:
+            return self.models[model_str]
+
+        instance = self.get_provider(provider)
+        if provider == "google-gla":
+            from pydantic_ai.models.google import GoogleModel
+
+            model = GoogleModel(model_name, provider=instance)
+        elif provider == "openai":
+            from pydantic_ai.models.openai import OpenAIChatModel
+
+            model = OpenAIChatModel(model_name, provider=instance)
+        else:
+            model = model_str
+
+        self.models[model_str] = model
+        return model
+
+    def get_session(self) -> requests.Session:
+        if self.session is None:
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_config["max_keepalive_connections"],
+                pool_maxsize=self.pool_config["max_connections"],
+            )
+            self.session = requests.Session()
+            self.session.mount("http://", adapter)
+            self.session.mount("https://", adapter)
+        return self.session
+
+    def get_instance(self, cls: type, **kwargs):
+        """
+        returns a shared instance of cls, one per distinct set of constructor args
+        """
+        key = (cls, tuple(sorted((k, id(v)) for k, v in kwargs.items())))
+        if key not in self.instances:
+            # keep the args alive so their ids can't be reused by other objects
+            self.instances[key] = (cls(**kwargs), kwargs)
+        return self.instances[key][0]
+
+    async def aclose(self):
+        for client in self.http_clients.values():
+            await client.aclose()
+        self.http_clients.clear()
+        self.providers.clear()
+        self.models.clear()
+        # shared instances hold models bound to the closed clients
+        self.instances.clear()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+_client_registry: Optional[ClientRegistry] = None
+
+
+def get_client_registry() -> ClientRegistry:
+    """the process wide default registry, created on first use"""
+    global _client_registry
+    if _client_registry is None:
+        _client_registry = ClientRegistry()
+    return _client_registry